@@ -6,10 +6,12 @@ Runs comprehensive benchmarks with various parameter combinations
 and provides real-time progress visualization.
 
 Usage:
-    python llama-bench-runner.py <model_path>
+    python llama-bench-runner.py <model_path> [--parallel N] [--batched] [--quiet]
     
 Example:
     python llama-bench-runner.py /path/to/model.gguf
+    python llama-bench-runner.py /path/to/model.gguf --parallel 2
+    python llama-bench-runner.py /path/to/model.gguf --batched
 """
 
 import subprocess
@@ -17,6 +19,11 @@ import sys
 import os
 import json
 import signal
+import re
+import asyncio
+import threading
+import argparse
+from collections import Counter, deque
 from datetime import datetime
 from pathlib import Path
 from dataclasses import dataclass
@@ -31,14 +38,47 @@ except ImportError:
     print("Installing required dependency: rich")
     subprocess.check_call([sys.executable, "-m", "pip", "install", "rich", "-q"])
 
+# orjson is optional: much faster parsing of llama-bench's JSONL output,
+# falls back to the stdlib json module when unavailable
+try:
+    import orjson
+
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:
+    orjson = None
+    json_loads = json.loads
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
 from rich.console import Console, Group
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn, TaskID
 from rich.table import Table
 from rich.live import Live
 from rich.panel import Panel
 from rich.text import Text
+from rich.markup import escape
 from rich import box
 
+# Buffer limit of the llama-bench output streams
+STREAM_LIMIT = 1 << 20
+
+# Maximum size of one read from a llama-bench output stream
+READ_CHUNK_SIZE = 1 << 16
+
+# Number of most recent results shown in the live table
+RESULTS_SHOWN = 10
+
+# Results between progress lines when not running in a terminal
+LOG_EVERY = 10
+
+# Number of trailing llama-bench stderr lines kept for error reports
+STDERR_TAIL_LINES = 64
+
+# One item of llama-bench's int list syntax, as parsed by its parse_int_range()
+_INT_RANGE_RE = re.compile(r"(\d+)(?:-(\d+)(?:([+*])(\d+))?)?(?:,|$)")
+
 # =============================================
 # Configuration
 # =============================================
@@ -59,27 +99,86 @@ class BenchConfig:
     # Output settings
     output_dir: str = "test-results"
     
+    # Number of KV cache configs benchmarked concurrently
+    parallel: int = 1
+    
+    # Use llama-batched-bench, which measures each prompt/generation pair in
+    # one combined pass within a single process (depths are not supported)
+    use_batched_bench: bool = False
+    
     def __post_init__(self):
         if self.kv_cache_types is None:
             self.kv_cache_types = [
                 # ("f16", "f16"),
                 ("q8_0", "q8_0"),
             ]
+        
+        # Parsed once for the planned test count; llama-bench still gets the strings as-is
+        self.batch_list = self._split_opts(self.batch_sizes)
+        self.ubatch_list = self._split_opts(self.ubatch_sizes)
+        self.depth_list = self._split_opts(self.depths)
+        # llama-bench skips 0 prompt/generation lengths (e.g. "-n 0" for pp only)
+        self.prompt_list = [x for x in self._split_opts(self.prompt_lengths) if x > 0]
+        self.gen_list = [x for x in self._split_opts(self.gen_lengths) if x > 0]
+        
+        if self.use_batched_bench:
+            if len(self.batch_list) != 1 or len(self.ubatch_list) != 1:
+                raise ValueError("llama-batched-bench accepts a single batch and ubatch size")
+            if not self.prompt_list or not self.gen_list:
+                raise ValueError("llama-batched-bench needs a non-zero prompt and generation length")
 
     def count_combinations(self) -> int:
         """Estimate total number of tests per KV cache config"""
-        b = self._count_opts(self.batch_sizes)
-        ub = self._count_opts(self.ubatch_sizes)
-        d = self._count_opts(self.depths)
-        p = self._count_opts(self.prompt_lengths)
-        n = self._count_opts(self.gen_lengths)
-        
-        total = b * ub * d * p * n
+        b, ub = len(self.batch_list), len(self.ubatch_list)
+        p, n = len(self.prompt_list), len(self.gen_list)
+        if self.use_batched_bench:
+            total = b * ub * p * n
+        else:
+            total = b * ub * len(self.depth_list) * (p + n)
         return total if total > 0 else 1
 
+    def iter_planned_tests(self):
+        """Yield (batch, ubatch, depth, kind, size) for each planned test
+        
+        llama-bench runs prompt (pp) and generation (tg) tests separately,
+        so each batch/ubatch/depth combination yields one result per prompt
+        length plus one per generation length. llama-batched-bench yields one
+        combined pp+tg result per prompt/generation pair.
+        """
+        for batch in self.batch_list:
+            for ubatch in self.ubatch_list:
+                if self.use_batched_bench:
+                    for p in self.prompt_list:
+                        for n in self.gen_list:
+                            yield batch, ubatch, 0, "pp+tg", p + n
+                    continue
+                for depth in self.depth_list:
+                    for size in self.prompt_list:
+                        yield batch, ubatch, depth, "pp", size
+                    for size in self.gen_list:
+                        yield batch, ubatch, depth, "tg", size
+
     @staticmethod
-    def _count_opts(s: str) -> int:
-        return len(s.split(',')) if s else 0
+    def _split_opts(s: str) -> List[int]:
+        """Expand a llama-bench int list: comma-separated first[-last[(+|*)step]]"""
+        values = []
+        pos = 0
+        while pos < len(s):
+            match = _INT_RANGE_RE.match(s, pos)
+            if not match:
+                raise ValueError(f"invalid range format: {s!r}")
+            first = int(match[1])
+            last = int(match[2]) if match[2] else first
+            op = match[3] or "+"
+            step = int(match[4]) if match[4] else 1
+            i = first
+            while i <= last:
+                values.append(i)
+                prev, i = i, (i + step if op == "+" else i * step)
+                if i <= prev:
+                    raise ValueError(f"invalid range format: {s!r}")
+            pos = match.end()
+        return values
 
 
 # =============================================
@@ -89,14 +188,28 @@ class BenchConfig:
 class BenchmarkVisualizer:
     """Minimalist visualization for benchmark progress"""
     
-    def __init__(self, total_runs_per_config: int, config: BenchConfig):
+    def __init__(self, total_runs: int, config: BenchConfig, interactive: bool = True):
         self.console = Console()
-        self.total_runs_per_config = total_runs_per_config
+        self.total_runs = total_runs
         self.config = config
-        self.results_history = []
+        # Without a terminal, progress is reported as plain log lines instead
+        self.interactive = interactive
+        # Pre-formatted table rows for the most recent results
+        self.results_history = deque(maxlen=RESULTS_SHOWN)
+        self.total_done = 0
         self.start_time = time.time()
+        # Guards shared state when several configs report results concurrently
+        self.lock = threading.Lock()
+        # Last rendered results display, rebuilt only after new results arrive
+        self._last_display = None
+        self._dirty = True
         
-        # Main Progress Bar
+        self.system_info = None
+        self.progress = None
+        if not interactive:
+            return
+
+        # Overall progress bar plus one bar per KV cache config
         self.progress = Progress(
             SpinnerColumn(style="cyan"),
             TextColumn("[bold cyan]{task.description}"),
@@ -104,13 +217,25 @@ class BenchmarkVisualizer:
             TextColumn("[dim]{task.percentage:>3.0f}%"),
             TimeElapsedColumn(),
         )
-        self.task_id = self.progress.add_task("Running Benchmarks...", total=total_runs_per_config)
+        self.task_id = self.progress.add_task("Overall", total=total_runs)
+        per_config_runs = config.count_combinations()
+        self.tasks: Dict[str, TaskID] = {
+            f"{k}/{v}": self.progress.add_task(f"  {k}/{v}", total=per_config_runs)
+            for k, v in config.kv_cache_types
+        }
 
-        self.system_info = None
+    def __rich__(self) -> Group:
+        return Group(self.progress, self.generate_display())
 
     def generate_display(self) -> Group:
-        """Generate the minimalist table display"""
-        
+        """Return the minimalist table display, rebuilding it only when stale"""
+        with self.lock:
+            if self._dirty or self._last_display is None:
+                self._last_display = self._build_display()
+                self._dirty = False
+            return self._last_display
+
+    def _build_display(self) -> Group:
         # System Info Header
         header_group = []
         if self.system_info:
@@ -138,56 +263,59 @@ class BenchmarkVisualizer:
         table.add_column("Depth", justify="right", style="dim")
         table.add_column("Speed", justify="right")
         
-        # Show last 10 results
-        for res in self.results_history[-10:]:
-            self._add_result_row(table, res)
+        # Show last results
+        for row in self.results_history:
+            table.add_row(*row)
             
         return Group(*header_group, table)
 
-    def _add_result_row(self, table: Table, res: dict):
-        kv = res['kv']
-        batch = str(res['batch'])
-        io = f"{res['n_prompt']} / {res['n_gen']}"
-        depth = str(res['n_depth'])
-        
-        enc_s = res['enc_speed']
-        gen_s = res['gen_speed']
-        
+    @staticmethod
+    def _format_result_row(kv_str: str, batch, n_prompt: int, n_gen: int, n_depth: int,
+                           enc_s: float, gen_s: float) -> Tuple[str, str, str, str, str]:
         speed_str = "-"
-        if enc_s > 0:
+        if enc_s > 0 and gen_s > 0:
+            speed_str = f"[green]PP: {enc_s:,.1f}[/green] [blue]TG: {gen_s:,.1f}[/blue] t/s"
+        elif enc_s > 0:
             speed_str = f"[green]PP: {enc_s:,.1f} t/s[/green]"
         elif gen_s > 0:
             speed_str = f"[blue]TG: {gen_s:,.1f} t/s[/blue]"
         
-        table.add_row(kv, batch, io, depth, speed_str)
+        return kv_str, str(batch), f"{n_prompt} / {n_gen}", str(n_depth), speed_str
 
     def update_result(self, result_json, kv_str):
-        if not self.system_info:
+        # llama-batched-bench rows carry no device info, so no header is shown for them
+        if not self.system_info and result_json.get("gpu_info"):
             self.system_info = {
-                "gpu_info": result_json.get("gpu_info", ""),
-                "backends": result_json.get("backends", ""),
+                "gpu_info": result_json["gpu_info"],
+                "backends": result_json.get("backends") or "Unknown Backend",
                 "main_gpu": result_json.get("main_gpu", 0)
             }
         n_prompt = result_json.get("n_prompt", 0)
         n_gen = result_json.get("n_gen", 0)
         n_depth = result_json.get("n_depth", 0)
         
+        if not self.interactive:
+            self.total_done += 1
+            if self.total_done % LOG_EVERY == 0 or self.total_done == self.total_runs:
+                print(f"[{self.total_done}/{self.total_runs}] {kv_str} "
+                      f"P/G {n_prompt}/{n_gen} depth {n_depth}", flush=True)
+            return
+        
         enc_speed, gen_speed = self._calculate_speeds(result_json, n_prompt, n_gen)
         
-        entry = {
-            "kv": kv_str,
-            "batch": result_json.get("n_batch", "?"),
-            "n_prompt": n_prompt,
-            "n_gen": n_gen,
-            "n_depth": n_depth,
-            "enc_speed": enc_speed,
-            "gen_speed": gen_speed
-        }
-        self.results_history.append(entry)
-        self.progress.advance(self.task_id)
+        row = self._format_result_row(kv_str, result_json.get("n_batch", "?"),
+                                      n_prompt, n_gen, n_depth, enc_speed, gen_speed)
+        with self.lock:
+            self.results_history.append(row)
+            self.total_done += 1
+            self._dirty = True
+            self.progress.advance(self.tasks[kv_str])
+            self.progress.advance(self.task_id)
 
-    def _calculate_speeds(self, result_json: dict, n_prompt: int, n_gen: int) -> Tuple[float, float]:
-        avg_ts = result_json.get("avg_ts", 0)
+    @staticmethod
+    def _calculate_speeds(result_json: dict, n_prompt: int, n_gen: int) -> Tuple[float, float]:
+        get = result_json.get
+        avg_ts = get("avg_ts", 0)
         
         if n_gen == 0:
             return float(avg_ts), 0.0
@@ -195,17 +323,19 @@ class BenchmarkVisualizer:
         if avg_ts > 0:
             return 0.0, float(avg_ts)
             
-        # Fallback calculation
-        t_enc = result_json.get("t_pp_ms", 0)
-        t_gen = result_json.get("t_tg_ms", 0)
+        # Fallback calculation from the per-phase times (ms)
+        t_enc = get("t_pp_ms", 0)
+        t_gen = get("t_tg_ms", 0)
         
-        enc_s = (n_prompt / (t_enc/1000.0)) if t_enc > 0 else 0.0
-        gen_s = (n_gen / (t_gen/1000.0)) if t_gen > 0 else 0.0
+        enc_s = n_prompt * 1000.0 / t_enc if t_enc > 0 else 0.0
+        gen_s = n_gen * 1000.0 / t_gen if t_gen > 0 else 0.0
         
         return enc_s, gen_s
 
     def log_error(self, msg):
-        self.console.print(f"[red]Error: {msg}[/red]")
+        # Messages carry llama-bench stderr and exception text, which may contain
+        # square brackets (e.g. "[/INST]") that rich would parse as markup
+        self.console.print(f"[red]Error: {escape(msg)}[/red]")
 
 
 # =============================================
@@ -215,25 +345,52 @@ class BenchmarkVisualizer:
 class LlamaBenchRunner:
     """Main benchmark runner class"""
     
-    def __init__(self, model_path: str, config: Optional[BenchConfig] = None):
+    # Fixed llama-bench flags shared by every run
+    BENCH_FLAGS = ("-fa", "1", "-r", "3")
+    # Fixed llama-batched-bench flags, matching llama-bench's defaults
+    BATCHED_BENCH_FLAGS = ("-fa", "on", "-ngl", "99", "-npl", "1")
+    
+    def __init__(self, model_path: str, config: Optional[BenchConfig] = None,
+                 interactive: bool = True):
         self.model_path = Path(model_path)
         self.config = config or BenchConfig()
+        self.interactive = interactive
         self.console = Console()
-        self.process = None
+        self._model_path_str = str(self.model_path)
+        # One date for the whole sweep, even if it runs past midnight
+        self._date_str = datetime.now().strftime("%Y%m%d")
+        self._commands: Dict[Tuple[str, str], tuple] = {}
         
         if not self.model_path.exists():
             self.console.print(f"[red]Error: Model file not found: {self.model_path}[/red]")
             sys.exit(1)
         
+        # Resolve the benchmark binary once, failing early if it's not usable
+        bench_name = "llama-batched-bench" if self.config.use_batched_bench else "llama-bench"
+        self.bench_bin = shutil.which(bench_name)
+        if not self.bench_bin or not os.access(self.bench_bin, os.X_OK):
+            self.console.print(f"[red]Error: {bench_name} not found in PATH or not executable[/red]")
+            sys.exit(1)
+        
         self.output_dir = Path(self.config.output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
     
-    def build_command(self, cache_type_k: str, cache_type_v: str) -> list:
-        return [
-            "llama-bench",
-            "-fa", "1",
-            "-r", "3",
-            "-m", str(self.model_path),
+    def build_command(self, cache_type_k: str, cache_type_v: str) -> tuple:
+        key = (cache_type_k, cache_type_v)
+        cmd = self._commands.get(key)
+        if cmd is None:
+            if self.config.use_batched_bench:
+                cmd = self._build_batched_command(cache_type_k, cache_type_v)
+            else:
+                cmd = self._build_bench_command(cache_type_k, cache_type_v)
+            self._commands[key] = cmd
+        return cmd
+    
+    def _build_bench_command(self, cache_type_k: str, cache_type_v: str) -> tuple:
+        return (
+            self.bench_bin,
+            *self.BENCH_FLAGS,
+            "-m", self._model_path_str,
             "-ctk", cache_type_k,
             "-ctv", cache_type_v,
             "-b", self.config.batch_sizes,
@@ -242,128 +399,280 @@ class LlamaBenchRunner:
             "-p", self.config.prompt_lengths,
             "-n", self.config.gen_lengths,
             "-o", "jsonl",
-        ]
+        )
+    
+    def _build_batched_command(self, cache_type_k: str, cache_type_v: str) -> tuple:
+        # The context must hold the longest prompt plus the longest generation
+        ctx = max(self.config.prompt_list) + max(self.config.gen_list)
+        return (
+            self.bench_bin,
+            *self.BATCHED_BENCH_FLAGS,
+            "-m", self._model_path_str,
+            "-ctk", cache_type_k,
+            "-ctv", cache_type_v,
+            "-c", str(ctx),
+            # Parsed values, so 0 lengths are dropped as in the planned test count
+            # and range syntax (which llama-batched-bench lacks) is expanded
+            "-b", str(self.config.batch_list[0]),
+            "-ub", str(self.config.ubatch_list[0]),
+            "-npp", ",".join(map(str, self.config.prompt_list)),
+            "-ntg", ",".join(map(str, self.config.gen_list)),
+            "--output-format", "jsonl",
+        )
     
     def get_output_filename(self, cache_type_k: str, cache_type_v: str) -> Path:
-        date_str = datetime.now().strftime("%Y%m%d")
-        return self.output_dir / f"raw-data-{cache_type_k}-{cache_type_v}-{date_str}.json"
+        # Batched results use a different schema, which the dashboard skips by suffix
+        suffix = ".batched.jsonl" if self.config.use_batched_bench else ".jsonl"
+        return self.output_dir / f"raw-data-{cache_type_k}-{cache_type_v}-{self._date_str}{suffix}"
     
     def run_all(self):
         """Run all benchmark configurations with visualization"""
         per_config_runs = self.config.count_combinations()
         total_runs = per_config_runs * len(self.config.kv_cache_types)
         
-        visualizer = BenchmarkVisualizer(total_runs, self.config)
+        visualizer = BenchmarkVisualizer(total_runs, self.config, self.interactive)
+        self._install_child_watcher()
         
         try:
-            with Live(Group(visualizer.progress, visualizer.generate_display()), 
-                      refresh_per_second=10, 
-                      console=self.console) as live_display:
-                
-                for k, v in self.config.kv_cache_types:
-                    self._run_single_config(k, v, visualizer, live_display)
+            if self.interactive:
+                # Live redraws on its own timer; results only mark the display stale
+                with Live(visualizer,
+                          auto_refresh=True,
+                          refresh_per_second=4,
+                          console=self.console):
+                    asyncio.run(self._run_configs(visualizer))
+            else:
+                asyncio.run(self._run_configs(visualizer))
 
         except KeyboardInterrupt:
             self._handle_interrupt()
             
         self.print_summary(visualizer)
 
-    def _run_single_config(self, k: str, v: str, visualizer: BenchmarkVisualizer, live: Live):
+    @staticmethod
+    def _install_child_watcher():
+        """Reap llama-bench processes on the event loop instead of one thread each
+        
+        Before Python 3.12, asyncio waits for every subprocess in a dedicated
+        thread. A pidfd watcher turns child exits into ordinary loop events,
+        which is what 3.12+ already does by default on Linux.
+        """
+        if sys.version_info >= (3, 12) or not hasattr(asyncio, "PidfdChildWatcher"):
+            return
+        try:
+            os.close(os.pidfd_open(os.getpid()))
+        except (AttributeError, OSError):
+            return
+        asyncio.set_child_watcher(asyncio.PidfdChildWatcher())
+
+    async def _run_configs(self, visualizer: BenchmarkVisualizer):
+        """Run the KV cache configs on one event loop, at most `parallel` at a time"""
+        slots = asyncio.Semaphore(max(1, self.config.parallel))
+
+        async def run(k: str, v: str):
+            async with slots:
+                await self._run_single_config(k, v, visualizer)
+
+        # Gathering exceptions keeps one cancelled config from abandoning the
+        # others' cleanup on interrupt; anything else that escaped is reported
+        results = await asyncio.gather(*(run(k, v) for k, v in self.config.kv_cache_types),
+                                       return_exceptions=True)
+        for (k, v), result in zip(self.config.kv_cache_types, results):
+            if isinstance(result, BaseException) and not isinstance(result, asyncio.CancelledError):
+                visualizer.log_error(f"{k}/{v} failed: {result!r}")
+
+    async def _run_single_config(self, k: str, v: str, visualizer: BenchmarkVisualizer):
         kv_str = f"{k}/{v}"
         cmd = self.build_command(k, v)
         output_file = self.get_output_filename(k, v)
-        collected_results = []
+        result_count = 0
+        process = None
+        stderr_task = None
+        f = None
 
         try:
-            self.process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                limit=STREAM_LIMIT
             )
             
-            # Read stdout line by line until EOF
-            for line in iter(self.process.stdout.readline, ''):
+            # Drain stderr alongside stdout so a chatty llama-bench can't
+            # fill the pipe and block
+            stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+            stderr_task = asyncio.create_task(self._drain_stderr(process.stderr, stderr_tail))
+            
+            async for line in self._iter_lines(process.stdout):
                 result = self._parse_line(line)
                 if not result:
                     continue
                 
-                collected_results.append(result)
+                # Results are streamed to disk as JSONL, so whatever finished
+                # before a crash or interrupt is kept. The file is only opened
+                # once there is a result, so a failed rerun leaves an earlier
+                # file of the same name untouched.
+                if f is None:
+                    f = open(output_file, 'wb')
+                f.write(json_dumps(result) + b'\n')
+                f.flush()
+                result_count += 1
+                if self.config.use_batched_bench:
+                    # The file keeps the raw row; only the display gets derived fields
+                    result = self._batched_display_result(result)
                 visualizer.update_result(result, kv_str)
-                live.update(Group(visualizer.progress, visualizer.generate_display()))
             
-            rc = self.process.wait()
-            self._check_process_result(rc, collected_results, kv_str, visualizer)
+            await stderr_task
+            rc = await process.wait()
+            self._check_process_result(rc, stderr_tail, result_count, kv_str, visualizer)
 
         except Exception as e:
             visualizer.log_error(f"Error: {str(e)}")
-            # In case of error during execution, we still want to save what we have
         finally:
-            self._save_results(collected_results, output_file)
-            self.process = None
+            # Whether cancelled or failed, make sure llama-bench is gone before
+            # the next config takes this slot and the GPU
+            if process and process.returncode is None:
+                await self._interrupt_process(process)
+            if stderr_task and not stderr_task.done():
+                stderr_task.cancel()
+            if f is not None:
+                f.close()
 
-    def _parse_line(self, line: str) -> Optional[dict]:
+    @staticmethod
+    async def _interrupt_process(process: asyncio.subprocess.Process, timeout: float = 5.0):
+        """Ask llama-bench to stop with SIGINT, killing it if it does not exit in time
+        
+        Signals go through os.kill rather than Process.send_signal/kill: those
+        poll() the child first and would reap it behind the child watcher's
+        back when Ctrl-C has already stopped it. Until the watcher reaps it,
+        an exited child is a zombie, so the pid can't have been reused.
+        """
+        if process.returncode is not None:
+            return
+        os.kill(process.pid, signal.SIGINT)
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            os.kill(process.pid, signal.SIGKILL)
+            await process.wait()
+
+    @staticmethod
+    async def _iter_lines(stream: asyncio.StreamReader):
+        """Yield raw lines from a stream, taking everything buffered per wakeup"""
+        buf = bytearray()
+        while chunk := await stream.read(READ_CHUNK_SIZE):
+            buf += chunk
+            start = 0
+            while (idx := buf.find(b'\n', start)) != -1:
+                yield bytes(buf[start:idx])
+                start = idx + 1
+            del buf[:start]
+        if buf:
+            yield bytes(buf)
+
+    @classmethod
+    async def _drain_stderr(cls, stream: asyncio.StreamReader, tail: deque):
+        """Read stderr until EOF, keeping only the last lines"""
+        async for line in cls._iter_lines(stream):
+            tail.append(line)
+
+    def _parse_line(self, line: bytes) -> Optional[dict]:
+        if self.config.use_batched_bench:
+            return self._parse_batched_line(line)
         line = line.strip()
-        if not line:
+        # Cheap byte checks skip log/banner lines without invoking the parser
+        if not line.startswith(b'{') or b'"n_prompt"' not in line:
             return None
         try:
-            data = json.loads(line)
+            data = json_loads(line)
             if isinstance(data, dict) and "n_prompt" in data:
                 return data
         except json.JSONDecodeError:
             pass
         return None
 
-    def _check_process_result(self, rc: int, results: list, kv_str: str, visualizer: BenchmarkVisualizer):
+    @staticmethod
+    def _parse_batched_line(line: bytes) -> Optional[dict]:
+        """Parse a llama-batched-bench JSONL row"""
+        line = line.strip()
+        if not line.startswith(b'{') or b'"speed_pp"' not in line:
+            return None
+        try:
+            data = json_loads(line)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(data, dict) or "speed_pp" not in data:
+            return None
+        return data
+
+    @staticmethod
+    def _batched_display_result(data: dict) -> dict:
+        """Copy of a llama-batched-bench row with the llama-bench style fields the visualizer reads"""
+        # Timings are reported in seconds
+        return {
+            **data,
+            "n_prompt": data.get("pp", 0),
+            "n_gen": data.get("tg", 0),
+            "n_depth": 0,
+            "t_pp_ms": data.get("t_pp", 0) * 1000.0,
+            "t_tg_ms": data.get("t_tg", 0) * 1000.0,
+        }
+
+    def _check_process_result(self, rc: int, stderr_tail: deque, result_count: int,
+                              kv_str: str, visualizer: BenchmarkVisualizer):
         if rc != 0:
-            # Try to read stderr if available
-            err_msg = f"Process failed (rc={rc})"
-            if self.process and self.process.stderr:
-                err_out = self.process.stderr.read()
-                if err_out:
-                    err_msg += f"\nStderr: {err_out}"
+            err_msg = f"Process failed for {kv_str} (rc={rc})"
+            if stderr_tail:
+                err_out = b"\n".join(stderr_tail).decode(errors='replace')
+                err_msg += f"\nStderr: {err_out}"
             visualizer.log_error(err_msg)
-        elif not results:
+        elif not result_count:
             visualizer.log_error(f"No results for {kv_str}")
 
-    def _save_results(self, results: list, output_file: Path):
-        if not results:
-            return
-        try:
-            with open(output_file, 'w') as f:
-                json.dump(results, f, indent=2)
-        except IOError as e:
-            print(f"Failed to save results to {output_file}: {e}")
-
     def _handle_interrupt(self):
-        if self.process:
-            self.process.terminate()
         self.console.print("\n[yellow]Interrupted.[/yellow]")
         sys.exit(130)
 
     def print_summary(self, visualizer: BenchmarkVisualizer):
         elapsed = time.time() - visualizer.start_time
         self.console.print()
-        self.console.print(f"[bold green]Done.[/bold green] Time: {int(elapsed // 60)}m {int(elapsed % 60)}s")
+        self.console.print(f"[bold green]Done.[/bold green] Results: {visualizer.total_done} | "
+                           f"Time: {int(elapsed // 60)}m {int(elapsed % 60)}s")
+        self.console.print(f"Benchmark binary: [dim]{self.bench_bin}[/dim]")
         self.console.print(f"Results saved to: [dim]{self.output_dir}[/dim]")
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python llama-bench-runner.py <model_path>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Run llama-bench over a matrix of benchmark parameters")
+    parser.add_argument("model_path", help="path to the GGUF model file")
+    parser.add_argument("--parallel", type=int, default=1, metavar="N",
+                        help="number of KV cache configs to benchmark concurrently (default: 1)")
+    parser.add_argument("--batched", action="store_true",
+                        help="use llama-batched-bench for combined prompt + generation passes")
+    parser.add_argument("--quiet", action="store_true",
+                        help="plain progress lines instead of the live display "
+                             "(implied when stdout is not a terminal)")
+    args = parser.parse_args()
+    interactive = sys.stdout.isatty() and not args.quiet
+    
+    try:
+        config = BenchConfig(parallel=args.parallel, use_batched_bench=args.batched)
+    except ValueError as e:
+        parser.error(str(e))
         
-    runner = LlamaBenchRunner(sys.argv[1])
+    runner = LlamaBenchRunner(args.model_path, config, interactive)
     
     total_tests = len(runner.config.kv_cache_types) * runner.config.count_combinations()
-    print(f"Plan to run approximately {total_tests} tests.")
-    print("Press Enter to start...")
-    try:
-        input()
-    except KeyboardInterrupt:
-        sys.exit(0)
+    kinds = Counter(kind for *_, kind, _ in runner.config.iter_planned_tests())
+    breakdown = " + ".join(f"{count} {kind}" for kind, count in kinds.items())
+    print(f"Plan to run approximately {total_tests} tests "
+          f"({breakdown} per KV cache config).")
+    if interactive:
+        print("Press Enter to start...")
+        try:
+            input()
+        except KeyboardInterrupt:
+            sys.exit(0)
         
     runner.run_all()
 
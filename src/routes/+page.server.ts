@@ -10,12 +10,29 @@ async function getJsonFilesRecursively(dir: string): Promise<string[]> {
         if (entry.isDirectory()) {
             return getJsonFilesRecursively(res);
         } else {
-            return entry.name.endsWith('.json') ? [res] : [];
+            // llama-batched-bench output (*.batched.jsonl) lacks the fields the dashboard groups by
+            const isResult = entry.name.endsWith('.json')
+                || (entry.name.endsWith('.jsonl') && !entry.name.endsWith('.batched.jsonl'));
+            return isResult ? [res] : [];
         }
     }));
     return files.flat();
 }
 
+// Parse JSONL line by line so a torn last line from a killed run only loses that result
+function parseJsonLines(filePath: string, content: string): BenchmarkResult[] {
+    const results: BenchmarkResult[] = [];
+    content.split('\n').forEach((line, index) => {
+        if (!line.trim()) return;
+        try {
+            results.push(JSON.parse(line) as BenchmarkResult);
+        } catch (e) {
+            console.warn(`Skipping unparsable line ${index + 1} in ${filePath}:`, e);
+        }
+    });
+    return results;
+}
+
 export const load: PageServerLoad = async () => {
     const resultsDir = join(process.cwd(), 'static', 'results');
 
@@ -27,7 +44,10 @@ export const load: PageServerLoad = async () => {
         for (const filePath of jsonFiles) {
             try {
                 const content = await readFile(filePath, 'utf-8');
-                const data = JSON.parse(content) as BenchmarkResult[];
+                // Runner output is JSONL (one result per line), older results are JSON arrays
+                const data = filePath.endsWith('.jsonl')
+                    ? parseJsonLines(filePath, content)
+                    : JSON.parse(content) as BenchmarkResult[];
 
                 // Process gpu_info based on main_gpu index
                 data.forEach(result => {